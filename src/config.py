@@ -1,19 +1,77 @@
 import os
-from dotenv import load_dotenv
+from dataclasses import dataclass
+from typing import Optional
 
-load_dotenv()
+# Only parse a .env file when one is present; deployments that inject real
+# environment variables can skip the file read entirely
+if os.path.exists('.env') and os.getenv('CHAD_SKIP_DOTENV') != '1':
+    from dotenv import load_dotenv
+    load_dotenv()
 
-class Config:
-    GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
-    REPO_PATH = os.getenv('REPO_PATH')
-    REPO_OWNER = os.getenv('REPO_OWNER')
-    REPO_NAME = os.getenv('REPO_NAME')
-    MODEL_PATH = os.getenv('MODEL_PATH')
-    CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', '300'))
+# Response budgets per chunk and for the summary, and room reserved for the
+# instructions around them. Decoding is sequential, so reviews are kept short
+CHUNK_MAX_TOKENS = 384
+SUMMARY_MAX_TOKENS = 384
+PROMPT_OVERHEAD_TOKENS = 200
+# Least diff (or findings) a prompt must still have room for
+MIN_INPUT_TOKENS = 512
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    GITHUB_TOKEN: Optional[str]
+    REPO_OWNER: Optional[str]
+    REPO_NAME: Optional[str]
+    MODEL_PATH: Optional[str]
+    CHECK_INTERVAL: int
+    MAX_WORKERS: int
+    WEBHOOK_SECRET: Optional[str]
+    WEBHOOK_PORT: int
+    RECONCILE_INTERVAL: int
+    LLM_CONTEXT_SIZE: int
+    LLM_BATCH_SIZE: int
+    LLM_UBATCH_SIZE: int
+    LLM_THREADS: int
+    LLM_DRAFT_TOKENS: int
+    LLM_GPU_LAYERS: int
+    LLM_USE_MMAP: bool
 
     @classmethod
-    def validate(cls):
-        required_vars = ['GITHUB_TOKEN', 'REPO_PATH', 'REPO_OWNER', 'REPO_NAME', 'MODEL_PATH']
-        missing = [var for var in required_vars if not getattr(cls, var)]
+    def from_env(cls) -> 'Settings':
+        """Snapshot the configuration from the environment."""
+        return cls(
+            GITHUB_TOKEN=os.getenv('GITHUB_TOKEN'),
+            REPO_OWNER=os.getenv('REPO_OWNER'),
+            REPO_NAME=os.getenv('REPO_NAME'),
+            MODEL_PATH=os.getenv('MODEL_PATH'),
+            CHECK_INTERVAL=int(os.getenv('CHECK_INTERVAL', '300')),
+            # Workers overlap GitHub I/O; the model itself still runs one PR at a time
+            MAX_WORKERS=int(os.getenv('MAX_WORKERS', str(min(4, os.cpu_count() or 4)))),
+            # Setting a secret turns on webhook intake; polling then only reconciles
+            WEBHOOK_SECRET=os.getenv('WEBHOOK_SECRET'),
+            WEBHOOK_PORT=int(os.getenv('WEBHOOK_PORT', '8080')),
+            RECONCILE_INTERVAL=int(os.getenv('RECONCILE_INTERVAL', '3600')),
+            LLM_CONTEXT_SIZE=int(os.getenv('LLM_CONTEXT_SIZE', '8192')),
+            LLM_BATCH_SIZE=int(os.getenv('LLM_BATCH_SIZE', '2048')),
+            LLM_UBATCH_SIZE=int(os.getenv('LLM_UBATCH_SIZE', '512')),
+            # Prefill scales with cores, with diminishing returns past 16 threads
+            LLM_THREADS=int(os.getenv('LLM_THREADS', str(min(16, os.cpu_count() or 8)))),
+            # Tokens drafted per step by prompt lookup decoding. Off by default:
+            # llama.cpp then keeps logits for every prompt token (see README)
+            LLM_DRAFT_TOKENS=int(os.getenv('LLM_DRAFT_TOKENS', '0')),
+            # -1 offloads every layer when llama.cpp was built with GPU/Metal support
+            LLM_GPU_LAYERS=int(os.getenv('LLM_GPU_LAYERS', '-1')),
+            LLM_USE_MMAP=os.getenv('LLM_USE_MMAP', '1') == '1',
+        )
+
+    def validate(self):
+        required_vars = ['GITHUB_TOKEN', 'REPO_OWNER', 'REPO_NAME', 'MODEL_PATH']
+        missing = [var for var in required_vars if not getattr(self, var)]
         if missing:
             raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
+
+        min_context = max(CHUNK_MAX_TOKENS, SUMMARY_MAX_TOKENS) + PROMPT_OVERHEAD_TOKENS + MIN_INPUT_TOKENS
+        if self.LLM_CONTEXT_SIZE < min_context:
+            raise ValueError(f"LLM_CONTEXT_SIZE must be at least {min_context}, got {self.LLM_CONTEXT_SIZE}")
+
+# Read once at import; the rest of the service shares this frozen snapshot
+Config = Settings.from_env()
@@ -1,24 +1,78 @@
 import sqlite3
+import threading
 from datetime import datetime, timezone
-from typing import Optional, List, Tuple
+from typing import Iterable, Optional, List, Set, Tuple
 import logging
 from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
+# Hot statements are kept as constants so every call reuses the same SQL text,
+# and with it the connection's prepared-statement cache entry
+INSERT_PROCESSED_PR_SQL = '''INSERT INTO processed_prs (pr_number, processed_at, status, review_url) 
+                             VALUES (?, ?, ?, ?)'''
+INSERT_REVIEW_HISTORY_SQL = '''INSERT INTO review_history (pr_number, reviewed_at, feedback, status)
+                               VALUES (?, ?, ?, ?)'''
+SELECT_REVIEW_HISTORY_SQL = '''SELECT reviewed_at, feedback, status 
+                               FROM review_history 
+                               WHERE pr_number = ?
+                               ORDER BY reviewed_at DESC'''
+SELECT_CACHED_REVIEW_SQL = 'SELECT review FROM review_cache WHERE diff_hash = ?'
+UPSERT_CACHED_REVIEW_SQL = '''INSERT OR REPLACE INTO review_cache (diff_hash, review, created_at)
+                              VALUES (?, ?, ?)'''
+
+def open_connection(db_path: str) -> sqlite3.Connection:
+    """Open a long-lived, autocommit SQLite connection tuned for the reviewer."""
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None,
+                           cached_statements=256)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-64000')
+    conn.execute('PRAGMA busy_timeout=5000')
+    return conn
+
 class DatabaseManager:
     def __init__(self, db_path: str = "data/pr_tracker.db"):
         self.db_path = db_path
+        self._conn = open_connection(db_path)
+        self._lock = threading.RLock()
         self.init_db()
+        self._processed_cache = self._load_processed_cache()
 
     @contextmanager
-    def get_connection(self):
-        """Context manager for database connections."""
-        conn = sqlite3.connect(self.db_path)
-        try:
+    def get_connection(self, conn: Optional[sqlite3.Connection] = None):
+        """Context manager yielding the shared connection under the manager lock.
+
+        If ``conn`` is given (e.g. from an open ``transaction()``), it is reused as-is.
+        """
+        if conn is not None:
             yield conn
-        finally:
-            conn.close()
+            return
+        with self._lock:
+            yield self._conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a group of writes in a single BEGIN IMMEDIATE/COMMIT transaction."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+                self._conn.execute('COMMIT')
+            except Exception:
+                # A failed COMMIT (e.g. SQLITE_BUSY) can leave the transaction open, and
+                # later writes on the shared connection would silently join it
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                # Forget PRs marked processed by the rolled-back writes
+                self._processed_cache = self._load_processed_cache()
+                raise
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
 
     def init_db(self):
         """Initialize the database with required tables."""
@@ -42,44 +96,74 @@ class DatabaseManager:
                     FOREIGN KEY (pr_number) REFERENCES processed_prs (pr_number)
                 )
             ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_review_history_pr
+                ON review_history (pr_number)
+            ''')
+
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS review_cache (
+                    diff_hash TEXT PRIMARY KEY,
+                    review TEXT,
+                    created_at TIMESTAMP
+                )
+            ''')
+
+    def _load_processed_cache(self) -> Set[int]:
+        """Load the numbers of all processed PRs into memory."""
+        with self.get_connection() as conn:
+            cursor = conn.execute('SELECT pr_number FROM processed_prs')
+            return {row[0] for row in cursor}
 
     def is_pr_processed(self, pr_number: int) -> bool:
         """Check if a PR has been processed."""
-        with self.get_connection() as conn:
-            cursor = conn.execute(
-                'SELECT 1 FROM processed_prs WHERE pr_number = ?', 
-                (pr_number,)
-            )
-            return cursor.fetchone() is not None
+        return pr_number in self._processed_cache
 
-    def mark_pr_processed(self, pr_number: int, status: str = "completed", review_url: Optional[str] = None):
+    def mark_pr_processed(self, pr_number: int, status: str = "completed", review_url: Optional[str] = None,
+                          conn: Optional[sqlite3.Connection] = None):
         """Mark a PR as processed."""
-        with self.get_connection() as conn:
+        with self.get_connection(conn) as conn:
             conn.execute(
-                '''INSERT INTO processed_prs (pr_number, processed_at, status, review_url) 
-                   VALUES (?, ?, ?, ?)''',
+                INSERT_PROCESSED_PR_SQL,
                 (pr_number, datetime.now(timezone.utc), status, review_url)
             )
-            conn.commit()
+        self._processed_cache.add(pr_number)
 
-    def add_review_history(self, pr_number: int, feedback: str, status: str = "completed"):
+    def add_review_history(self, pr_number: int, feedback: str, status: str = "completed",
+                           conn: Optional[sqlite3.Connection] = None):
         """Add a review to the history."""
-        with self.get_connection() as conn:
+        with self.get_connection(conn) as conn:
             conn.execute(
-                '''INSERT INTO review_history (pr_number, reviewed_at, feedback, status)
-                   VALUES (?, ?, ?, ?)''',
+                INSERT_REVIEW_HISTORY_SQL,
                 (pr_number, datetime.now(timezone.utc), feedback, status)
             )
-            conn.commit()
+
+    def add_review_history_many(self, rows: Iterable[Tuple[int, str, str]]):
+        """Add many (pr_number, feedback, status) reviews to the history in one transaction."""
+        now = datetime.now(timezone.utc)
+        with self.transaction() as conn:
+            conn.executemany(
+                INSERT_REVIEW_HISTORY_SQL,
+                ((pr_number, now, feedback, status) for pr_number, feedback, status in rows)
+            )
 
     def get_review_history(self, pr_number: int) -> List[Tuple]:
         """Get review history for a PR."""
         with self.get_connection() as conn:
-            cursor = conn.execute(
-                '''SELECT reviewed_at, feedback, status 
-                   FROM review_history 
-                   WHERE pr_number = ?
-                   ORDER BY reviewed_at DESC''',
-                (pr_number,)
-            )
+            cursor = conn.execute(SELECT_REVIEW_HISTORY_SQL, (pr_number,))
             return cursor.fetchall()
+
+    def get_cached_review(self, diff_hash: str) -> Optional[str]:
+        """Get a previously generated review for an identical diff."""
+        with self.get_connection() as conn:
+            cursor = conn.execute(SELECT_CACHED_REVIEW_SQL, (diff_hash,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def cache_review(self, diff_hash: str, review: str):
+        """Store the review generated for a diff."""
+        with self.get_connection() as conn:
+            conn.execute(
+                UPSERT_CACHED_REVIEW_SQL,
+                (diff_hash, review, datetime.now(timezone.utc))
+            )
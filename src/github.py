@@ -1,9 +1,17 @@
 import requests
-from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Stop reading a PR diff past this size instead of buffering it all
+MAX_DIFF_BYTES = 10 * 1024 * 1024
+# Read the diff in large blocks; requests' 512-byte default means many tiny reads
+DIFF_CHUNK_BYTES = 64 * 1024
+
 class GitHubClient:
     def __init__(self, token: str, owner: str, repo: str):
         self.base_url = "https://api.github.com"
@@ -14,6 +22,58 @@ class GitHubClient:
         self.owner = owner
         self.repo = repo
 
+        # Pool keep-alive connections to api.github.com instead of a new TLS handshake per call
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retries))
+
+        # Remaining calls and reset epoch per rate-limit resource ('core', 'graphql', ...)
+        self._rate_limits: Dict[str, Tuple[int, int]] = {}
+
+        # ETag and parsed body of the last 200 response, keyed by request
+        self._etag_cache: Dict[Tuple, Tuple[str, Any]] = {}
+
+    def _request(self, method: str, url: str, resource: str = 'core', **kwargs) -> requests.Response:
+        """Send a request, pausing first if the rate-limit budget is spent."""
+        remaining, reset = self._rate_limits.get(resource, (None, 0))
+        if remaining is not None and remaining < 2:
+            delay = reset - time.time()
+            if delay > 0:
+                logger.warning(f"GitHub {resource} rate limit nearly exhausted, sleeping {delay:.0f}s until reset")
+                time.sleep(delay)
+
+        response = self.session.request(method, url, **kwargs)
+
+        if 'X-RateLimit-Remaining' in response.headers:
+            resource = response.headers.get('X-RateLimit-Resource', resource)
+            self._rate_limits[resource] = (
+                int(response.headers['X-RateLimit-Remaining']),
+                int(response.headers.get('X-RateLimit-Reset', 0))
+            )
+        return response
+
+    def _get_json_conditional(self, url: str, params: Optional[Dict] = None) -> Any:
+        """GET a JSON resource, revalidating any cached copy with If-None-Match.
+
+        A 304 Not Modified reply does not count against the rate limit and
+        carries no body, so the cached parse is returned instead.
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        cached = self._etag_cache.get(key)
+        headers = {'If-None-Match': cached[0]} if cached else None
+
+        response = self._request('GET', url, headers=headers, params=params)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+
+        data = response.json()
+        etag = response.headers.get('ETag')
+        if etag:
+            self._etag_cache[key] = (etag, data)
+        return data
+
     def get_pull_requests(self, state: str = "open") -> List[Dict]:
         """Fetch pull requests from GitHub."""
         logger.info("Fetching PRs from GitHub")
@@ -21,13 +81,60 @@ class GitHubClient:
         params = {'state': state}
         
         try:
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json_conditional(url, params=params)
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to fetch pull requests: {e}")
             return []
 
+    def graphql(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict]:
+        """Run a GraphQL query and return its data payload."""
+        url = f"{self.base_url}/graphql"
+        data = {'query': query, 'variables': variables or {}}
+
+        try:
+            response = self._request('POST', url, resource='graphql', json=data)
+            response.raise_for_status()
+            payload = response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to run GraphQL query: {e}")
+            return None
+
+        if payload.get('errors'):
+            logger.error(f"GraphQL query returned errors: {payload['errors']}")
+        return payload.get('data')
+
+    def get_pr_changed_files(self, pr_numbers: List[int]) -> Dict[int, List[str]]:
+        """Get the changed file paths of several pull requests in one GraphQL query.
+
+        PRs whose file list could not be fetched in full are left out of the result.
+        """
+        if not pr_numbers:
+            return {}
+
+        logger.info("Get changed files for PRs")
+        fields = '\n'.join(
+            f'pr{int(n)}: pullRequest(number: {int(n)}) {{ changedFiles files(first: 100) {{ nodes {{ path }} }} }}'
+            for n in pr_numbers
+        )
+        query = f'query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}'
+
+        data = self.graphql(query, {'owner': self.owner, 'name': self.repo})
+        repository = (data or {}).get('repository') or {}
+
+        changed_files = {}
+        for n in pr_numbers:
+            pr = repository.get(f'pr{int(n)}')
+            if not pr:
+                continue
+            # files is nullable, and partial-error replies can leave out any field
+            nodes = (pr.get('files') or {}).get('nodes')
+            if nodes is None or None in nodes:
+                continue
+            paths = [node['path'] for node in nodes]
+            if len(paths) == pr.get('changedFiles'):
+                changed_files[n] = paths
+        return changed_files
+
     def submit_review_comment(self, pr_number: int, comment: str) -> bool:
         """Submit a review comment on a pull request."""
         logger.info("Submitting review on PR")
@@ -37,22 +144,48 @@ class GitHubClient:
         try:
             logger.info(url)
             logger.info(data)
-            # response = requests.post(url, headers=self.headers, json=data)
+            # response = self._request('POST', url, json=data)
             # response.raise_for_status()
             return True
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to submit review comment: {e}")
             return False
 
+    def get_pr_diff(self, pr_number: int) -> Optional[Iterator[str]]:
+        """Stream the unified diff of a pull request, line by line."""
+        logger.info("Get PR diff")
+        url = f"{self.base_url}/repos/{self.owner}/{self.repo}/pulls/{pr_number}"
+        headers = {'Accept': 'application/vnd.github.v3.diff'}
+
+        try:
+            response = self._request('GET', url, headers=headers, stream=True)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to fetch PR diff: {e}")
+            return None
+
+        return self._iter_diff_lines(response, pr_number)
+
+    def _iter_diff_lines(self, response: requests.Response, pr_number: int) -> Iterator[str]:
+        """Decode a streamed diff response into lines, up to MAX_DIFF_BYTES."""
+        received = 0
+        try:
+            for line in response.iter_lines(chunk_size=DIFF_CHUNK_BYTES):
+                received += len(line) + 1
+                if received > MAX_DIFF_BYTES:
+                    logger.warning(f"Diff for PR #{pr_number} exceeds {MAX_DIFF_BYTES} bytes, ignoring the rest")
+                    break
+                yield line.decode('utf-8', errors='replace')
+        finally:
+            response.close()
+
     def get_pr_files(self, pr_number: int) -> List[Dict]:
         """Get list of files changed in a pull request."""
         logger.info("Get list of changed files in a PR")
         url = f"{self.base_url}/repos/{self.owner}/{self.repo}/pulls/{pr_number}/files"
         
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json_conditional(url)
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to fetch PR files: {e}")
             return []
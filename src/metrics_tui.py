@@ -7,10 +7,16 @@ from rich.layout import Layout
 import asciichartpy
 import sqlite3
 import asyncio
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 
+# Partial-height blocks for bar graphs, from empty to full
+BAR_BLOCKS = " ▁▂▃▄▅▆▇█"
+# Rendered line graphs kept per widget
+LINE_CACHE_SIZE = 16
+
 class Graph(Static):
     """A widget for displaying ASCII graphs."""
     def __init__(self, title: str, graph_type: str = "line", *args, **kwargs):
@@ -18,9 +24,18 @@ class Graph(Static):
         self.title = title
         self.graph_type = graph_type
         self.data = []
+        # Last rendered bar graph, keyed on its inputs
+        self._bar_cache = (None, "")
+        # Recently rendered line graphs, least recently used first
+        self._line_cache: OrderedDict = OrderedDict()
 
     def create_line_graph(self, data, width=60, height=10):
         """Create a line graph using asciichartpy."""
+        key = (tuple(data), width, height)
+        if key in self._line_cache:
+            self._line_cache.move_to_end(key)
+            return self._line_cache[key]
+
         config = {
             'height': height,
             'width': width,
@@ -31,32 +46,40 @@ class Graph(Static):
                 asciichartpy.red
             ]
         }
-        return asciichartpy.plot(data, config)
+        graph = asciichartpy.plot(data, config)
+
+        self._line_cache[key] = graph
+        if len(self._line_cache) > LINE_CACHE_SIZE:
+            self._line_cache.popitem(last=False)
+        return graph
 
     def create_bar_graph(self, data, width=60, height=10):
         """Create a bar graph using Unicode block characters."""
         if not data:
             return ""
+
+        key = (tuple(data), width, height)
+        if self._bar_cache[0] == key:
+            return self._bar_cache[1]
             
-        max_val = max(data)
+        values = np.asarray(data, dtype=np.float64)
+        max_val = values.max()
         ratio = height / max_val if max_val > 0 else 0
-        bars = []
-        
-        blocks = " ▁▂▃▄▅▆▇█"
-        for val in data:
-            bar_height = val * ratio
-            full_blocks = int(bar_height)
-            remainder = bar_height - full_blocks
-            partial_block_idx = int(remainder * len(blocks))
-            
-            bar = "█" * full_blocks
-            if partial_block_idx > 0:
-                bar += blocks[partial_block_idx]
-            bar = bar.ljust(height)
-            bars.append(bar)
+
+        # Whole and partial block counts for every bar at once
+        scaled = values * ratio
+        full_blocks = scaled.astype(np.int64)
+        partial_block_idx = ((scaled - full_blocks) * len(BAR_BLOCKS)).astype(np.int64)
+
+        bars = [
+            ("█" * full + (BAR_BLOCKS[partial] if partial > 0 else "")).ljust(height)
+            for full, partial in zip(full_blocks.tolist(), partial_block_idx.tolist())
+        ]
         
         # Rotate the graph
-        return "\n".join("".join(row) for row in zip(*reversed(bars)))
+        graph = "\n".join("".join(row) for row in zip(*reversed(bars)))
+        self._bar_cache = (key, graph)
+        return graph
 
     def update_data(self, new_data):
         """Update the graph data."""
@@ -173,57 +196,43 @@ class PRMetricsDashboard(App):
         """Get historical data for graphs."""
         conn = sqlite3.connect(self.db_path)
         
-        # PR Processing history
-        pr_history = pd.read_sql_query('''
-            SELECT 
-                date(processing_start) as date,
-                COUNT(*) as count
-            FROM pr_metrics
-            WHERE date(processing_start) >= date('now', ?)
-            GROUP BY date(processing_start)
-            ORDER BY date
-        ''', conn, params=(f'-{days} days',))
-        
-        # Success rate history
-        success_history = pd.read_sql_query('''
-            SELECT 
-                date(processing_start) as date,
-                SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as rate
-            FROM pr_metrics
-            WHERE date(processing_start) >= date('now', ?)
-            GROUP BY date(processing_start)
-            ORDER BY date
-        ''', conn, params=(f'-{days} days',))
-        
-        # Processing times history
-        times_history = pd.read_sql_query('''
-            SELECT 
-                date(processing_start) as date,
-                AVG(processing_duration_seconds) as avg_time
-            FROM pr_metrics
-            WHERE date(processing_start) >= date('now', ?)
-            GROUP BY date(processing_start)
-            ORDER BY date
-        ''', conn, params=(f'-{days} days',))
-        
-        # Token usage history
-        token_history = pd.read_sql_query('''
+        # All daily series in one pass over pr_metrics, with token usage joined in.
+        # Filtering on the raw timestamp (not date(...)) lets SQLite use the index.
+        history = pd.read_sql_query('''
             SELECT 
-                date(timestamp) as date,
-                SUM(input_tokens + output_tokens) as total_tokens
-            FROM llm_metrics
-            WHERE date(timestamp) >= date('now', ?)
-            GROUP BY date(timestamp)
-            ORDER BY date
-        ''', conn, params=(f'-{days} days',))
+                pm.date,
+                pm.count,
+                pm.rate,
+                pm.avg_time,
+                COALESCE(tok.total_tokens, 0) as total_tokens
+            FROM (
+                SELECT 
+                    date(processing_start) as date,
+                    COUNT(*) as count,
+                    SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as rate,
+                    AVG(processing_duration_seconds) as avg_time
+                FROM pr_metrics
+                WHERE processing_start >= date('now', ?)
+                GROUP BY date(processing_start)
+            ) pm
+            LEFT JOIN (
+                SELECT 
+                    date(timestamp) as date,
+                    SUM(input_tokens + output_tokens) as total_tokens
+                FROM llm_metrics
+                WHERE timestamp >= date('now', ?)
+                GROUP BY date(timestamp)
+            ) tok ON tok.date = pm.date
+            ORDER BY pm.date
+        ''', conn, params=(f'-{days} days', f'-{days} days'))
         
         conn.close()
         
         return {
-            'pr_processing': pr_history['count'].tolist(),
-            'success_rate': success_history['rate'].tolist(),
-            'processing_times': times_history['avg_time'].tolist(),
-            'token_usage': token_history['total_tokens'].tolist()
+            'pr_processing': history['count'].tolist(),
+            'success_rate': history['rate'].tolist(),
+            'processing_times': history['avg_time'].tolist(),
+            'token_usage': history['total_tokens'].tolist()
         }
 
     async def update_metrics(self) -> None:
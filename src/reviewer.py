@@ -1,19 +1,21 @@
+import hashlib
 import logging
 import time
 import re
-from typing import Optional
-from datetime import datetime, timezone
-import git
-from queue import Queue
-from threading import Thread
+import signal
+from collections import deque
+from typing import Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
 from llama_cpp import Llama
-from queue import Empty
-from typing import List
+from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+from typing import Dict, List, Set, Tuple
 
-from .config import Config
+from .config import Config, CHUNK_MAX_TOKENS, PROMPT_OVERHEAD_TOKENS, SUMMARY_MAX_TOKENS
 from .github import GitHubClient
 from .database import DatabaseManager
 from .metrics import MetricsManager
+from .webhook import WebhookServer
 
 # Configure logging
 logging.basicConfig(
@@ -22,276 +24,400 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SKIP_EXTENSIONS = ('.lock', '.json', '.md', '.txt', '.yaml', '.yml', '.mod', '.sum', '.min.js')
+SKIP_PATHS = ('tests/', 'docs/', 'vendor/', 'migrations/', 'node_modules/')
+SKIP_PATHS_RE = re.compile('|'.join(re.escape(path) for path in SKIP_PATHS))
+
+FILE_HEADER_RE = re.compile(r' b/(.+)$')
+# git header lines inside a file section that carry no code
+DIFF_HEADER_PREFIXES = ('index ', 'new file mode', 'deleted file mode', 'similarity index',
+                        'rename from', 'rename to', 'old mode', 'new mode', 'Binary files',
+                        '\\ No newline')
+
+# Longer per-file diffs keep only their first and last half of this many lines
+MAX_FILE_DIFF_LINES = 100
+# Largest diff chunk, in model tokens, that fits the context next to both
+CHUNK_TOKEN_BUDGET = Config.LLM_CONTEXT_SIZE - CHUNK_MAX_TOKENS - PROMPT_OVERHEAD_TOKENS
+# Slack left when clipping a file for the truncation marker and for tokens that
+# merge differently once the clipped text is tokenized again inside the prompt
+CLIP_HEADROOM_TOKENS = 16
+# How many tokens of analyses fit beside the summary instructions and response
+SUMMARY_TOKEN_BUDGET = Config.LLM_CONTEXT_SIZE - SUMMARY_MAX_TOKENS - PROMPT_OVERHEAD_TOKENS
+# Fewer or shorter findings than this are posted as-is, without a summary pass
+SUMMARY_MIN_ANALYSES = 3
+SUMMARY_MIN_TOKENS = 800
+# Sampling shared by every generation; a run of blank lines means the model is done
+SAMPLING_PARAMS = {
+    'temperature': 0.3,
+    'top_k': 40,
+    'top_p': 0.9,
+    'repeat_penalty': 1.1,
+    'stop': ["\n\n\n", "Human:", "Assistant:"],
+}
+
+# All instructions come before the diff, so every chunk prompt starts with the
+# same tokens. llama-cpp-python keeps the KV cache for the longest common prefix
+# with the previous call, so a chunk that follows another chunk skips them
+ANALYZE_PREFIX = """As a senior developer specializing in database performance, review the section of a pull request below.
+
+Focus your analysis specifically on the changed lines and their immediate impact on:
+1. Query efficiency and N+1 problems
+2. Index usage
+3. Transaction boundaries
+4. Race conditions
+5. Cache invalidation
+6. Query plan impacts
+
+Format your response in a concise bullet-point format focusing only on issues found, if any.
+
+Pull request section:
+"""
+ANALYZE_SUFFIX = """
+
+Issues found:
+"""
+
+# Likewise for the summary: fixed instructions first, then the findings
+SUMMARY_PREFIX = """Synthesize the code review findings below into a cohesive summary.
+
+Focus on:
+1. Common themes across files
+2. Most critical issues
+3. Overall recommendations
+
+Format with sections:
+- Summary
+- Critical Issues
+- Recommendations
+
+Findings:
+"""
+SUMMARY_SUFFIX = """
+
+Review:
+"""
+
+def is_reviewable_path(filepath: str) -> bool:
+    """Whether changes to this file are worth sending to the LLM."""
+    return not (filepath.endswith(SKIP_EXTENSIONS) or SKIP_PATHS_RE.search(filepath))
+
 class PRReviewer:
     def __init__(self):
         Config.validate()
-        self.pr_queue = Queue()
+        self.executor = ThreadPoolExecutor(max_workers=Config.MAX_WORKERS, thread_name_prefix='pr-worker')
+        self._in_flight: Set[int] = set()
+        self._in_flight_lock = Lock()
+        self._stop_event = Event()
         self.db = DatabaseManager()
         self.github = GitHubClient(
             token=Config.GITHUB_TOKEN,
             owner=Config.REPO_OWNER,
             repo=Config.REPO_NAME
         )
-        
+
+        # Reviews quote the diff they are given, so drafting tokens by looking
+        # them up in the prompt lets most of a quote be verified in one pass
+        draft_model = None
+        if Config.LLM_DRAFT_TOKENS > 0:
+            draft_model = LlamaPromptLookupDecoding(num_pred_tokens=Config.LLM_DRAFT_TOKENS)
+
         # Initialize the model
         self.llm = Llama(
             model_path=Config.MODEL_PATH,
             verbose=False,
-            n_ctx=2048,
-            n_batch=4,
-            n_threads=2
+            n_ctx=Config.LLM_CONTEXT_SIZE,
+            n_batch=Config.LLM_BATCH_SIZE,  # Prompt tokens submitted per decode call
+            n_ubatch=Config.LLM_UBATCH_SIZE,  # Tokens per physical forward pass
+            n_threads=Config.LLM_THREADS,
+            n_threads_batch=Config.LLM_THREADS,
+            n_gpu_layers=Config.LLM_GPU_LAYERS,
+            use_mmap=Config.LLM_USE_MMAP,
+            use_mlock=False,
+            draft_model=draft_model  # Turns on logits_all when set
         )
-        
-        # Initialize git repo
-        self.repo = git.Repo(Config.REPO_PATH)
+        # llama.cpp is not reentrant, so workers take turns on the model
+        self._llm_lock = Lock()
 
         # Initialize metrics
         self.metrics = MetricsManager()
 
-    def get_pr_diff(self, pr_number: int) -> Optional[str]:
+    def get_pr_diff(self, pr_number: int, reviewable_files: Optional[Set[str]] = None) -> Optional[str]:
         """Get only the modified lines from a diff for a specific PR."""
-        logger.info("Getting PR Diff")
+        diff_lines = self.github.get_pr_diff(pr_number)
+        if diff_lines is None:
+            return None
+
         try:
-            self.repo.git.checkout('master')
+            return self.process_diff_content(diff_lines, reviewable_files)
+        finally:
+            # Release the connection even when parsing stops before the end
+            diff_lines.close()
 
-            self.repo.git.fetch('origin', f'pull/{pr_number}/head')
+    def process_diff_content(self, diff: Iterable[str], reviewable_files: Optional[Set[str]] = None) -> str:
+        """Process the diff to extract relevant changed lines with minimal context.
 
-            diff = self.repo.git.diff('master', 'FETCH_HEAD', unified=3, minimal=True, no_prefix=True, diff_filter='M')
+        ``diff`` is an iterable of lines, so a streamed diff is never held in memory
+        whole. Each file keeps at most its first and last ``MAX_FILE_DIFF_LINES // 2``
+        lines; the middle is counted and dropped as it streams past. What is left is
+        then held, with its ``File:`` line, to ``CHUNK_TOKEN_BUDGET`` tokens, again
+        keeping the head and tail, so every file fits a single chunk prompt.
 
-            processed_diff = self.process_diff_content(diff)
-            
-            # Return to master branch
-            self.repo.git.checkout('master')
-            
-            return processed_diff
-        except git.GitCommandError as e:
-            logger.error(f"Git error while getting diff: {e}")
-            return None
-        finally:
-            # Cleanup: delete the PR branch
-            try:
-                self.repo.git.branch('-D', f"pr-{pr_number}")
-            except git.GitCommandError:
-                pass
+        When the PR's ``reviewable_files`` are known up front, only those files are
+        kept and reading stops once all of them have been seen.
 
-    def process_diff_content(self, diff: str) -> str:
-        """Process the diff to extract relevant changed lines with minimal context."""
+        Deleted files, and files with no textual changes (pure renames, mode changes,
+        binaries), are left out entirely.
+        """
         logger.info("Processing diff content")
         processed_chunks = []
+        append = processed_chunks.append
         current_file = None
-        
-        print("Raw diff:", diff[:500])  # First 500 chars to see format
-        SKIP_EXTENSIONS = {'.lock', '.json', '.md', '.txt', '.yaml', '.yml', '.yaml', '.mod', '.sum'}
-        SKIP_PATHS = {'tests/', 'docs/', 'vendor/', 'migrations/'}
-        # Split diff into lines
-        lines = diff.split('\n')
-        
-        for line in lines:
+        section_start = 0
+        file_start = 0
+        half = MAX_FILE_DIFF_LINES // 2
+        tail = deque(maxlen=half)
+        dropped = 0
+        files_left = len(reviewable_files) if reviewable_files is not None else -1
+
+        def keep(line: str):
+            nonlocal dropped
+            if len(processed_chunks) - file_start < half:
+                append(line)
+            else:
+                if len(tail) == half:
+                    dropped += 1
+                tail.append(line)
+
+        def finish_file():
+            nonlocal dropped
+            # Nothing but the File: line would still cost a whole LLM call
+            if len(processed_chunks) == file_start:
+                del processed_chunks[section_start:]
+                return
+            if dropped:
+                append(f"[... {dropped} lines truncated ...]")
+            processed_chunks.extend(tail)
+            tail.clear()
+            dropped = 0
+            # Hold each file, header included, to what a single chunk prompt can take.
+            # This is the only tokenizer pass over the diff; llama.cpp would otherwise
+            # truncate an overflowing prompt silently
+            section = '\n'.join(processed_chunks[file_start - 1:])
+            processed_chunks[file_start - 1:] = [
+                self._clip_to_tokens(section, CHUNK_TOKEN_BUDGET - CLIP_HEADROOM_TOKENS)
+            ]
+
+        for line in diff:
+            # Dispatch on the first character; most lines are changes or context
+            kind = line[:1]
+
+            if kind == '+' or kind == '-':
+                # Skip lines of excluded files and the ---/+++ file markers
+                if current_file is not None and not line.startswith(('+++', '---')):
+                    keep(line)
+
+            elif kind == ' ' or kind == '\t' or not kind:
+                continue
+
+            # Include hunk headers but simplified
+            elif kind == '@':
+                if current_file is not None and line.startswith('@@ '):
+                    keep('@@@ Changes @@@')
+
             # Check for file header
-            if line.startswith('diff --git'):
-                if current_file:
-                    processed_chunks.append('')  # Add spacing between files
-                file_match = re.search(r'b/(.+)$', line)
-                if not file_match:
-                    continue
+            elif line.startswith('diff --git'):
+                # Everything after the last reviewable file would be thrown away
+                if files_left == 0:
+                    break
 
-                filepath = file_match.group(1)
+                if current_file is not None:
+                    finish_file()
 
-                if any(path in filepath for path in SKIP_PATHS):
+                file_match = FILE_HEADER_RE.search(line)
+                if not file_match:
                     current_file = None
                     continue
 
-                if any(ext in filepath for ext in SKIP_EXTENSIONS):
+                path = file_match.group(1)
+                if reviewable_files is None:
+                    reviewable = is_reviewable_path(path)
+                else:
+                    reviewable = path in reviewable_files
+                if not reviewable:
                     current_file = None
                     continue
 
-                if current_file:
-                    processed_chunks.append(f"File: {current_file}")
+                files_left -= 1
+                current_file = path
+                section_start = len(processed_chunks)
+                if processed_chunks:
+                    append('')  # Add spacing between files
+                append(f"File: {current_file}")
+                file_start = len(processed_chunks)
+
+            # Removed code has nothing left to review
+            elif line.startswith('deleted file mode'):
+                if current_file is not None:
+                    del processed_chunks[section_start:]
+                    current_file = None
 
-                current_file = filepath
-                processed_chunks.append(f"File: {current_file}")
-                continue
-                
-            # Skip if we're in a file we don't want to process
-            if current_file is None:
-                continue
+            # Include one line of context if it's meaningful, but not git's own headers
+            elif current_file is not None and not line.startswith(DIFF_HEADER_PREFIXES):
+                keep(' ' + line)
 
-            # Skip index lines and file markers
-            if (line.startswith('index ') or 
-                line.startswith('+++') or 
-                line.startswith('---')):
-                continue
-                
-            # Include hunk headers (showing line numbers) and modified lines
-            if (line.startswith('+') or 
-                line.startswith('-')):
-                processed_chunks.append(line)
+        if current_file is not None:
+            finish_file()
 
-            # Include hunk headers but simplified
-            elif line.startswith('@@ '):
-                processed_chunks.append('@@@ Changes @@@')
-                
-            # Include one line of context if it's meaningful
-            elif line.strip() and not line.startswith((' ', '\t')):
-                processed_chunks.append(' ' + line)
-
-        result = '\n'.join(processed_chunks)
-        
-        diff_length = len(result.split())
-        if diff_length > 500:
-            logger.warning(f"Large diff detected: {diff_length} words")
-            # Take only first part of each file's changes
-            chunks = result.split('File: ')
-            processed = ['File: ' + chunk[:1000] + '\n[truncated...]' 
-                for chunk in chunks[1:]]
-            return '\n'.join(processed)
-
-        return result
-
-    def analyze_diff(self, diff: str) -> str:
+        return '\n'.join(processed_chunks)
+
+    def analyze_diff(self, diff: str, pr_number: int) -> str:
         """Analyze the diff using the LLM."""
         logger.info("Analyzing Diff")
 
+        # Identical diffs (force-pushes, reopened PRs) reuse the earlier review
+        diff_hash = hashlib.sha256(diff.encode('utf-8')).hexdigest()
+        cached_review = self.db.get_cached_review(diff_hash)
+        if cached_review is not None:
+            logger.info(f"Reusing cached review for PR #{pr_number}")
+            return cached_review
+
         start_time = time.time()
-        all_analyses = []
+        # Token counts reported by llama.cpp, summed over every generation
+        usage = {'prompt_tokens': 0, 'completion_tokens': 0}
 
         try:
             file_chunks = diff.split('\nFile: ')
 
-            for chunk in file_chunks:
-                if not chunk.strip():
-                    continue
-
-                chunk_tokens = len(chunk.split())
+            # Collect every prompt up front, then run them back to back. Files were
+            # already clipped to the chunk budget by process_diff_content
+            prompts = [self.build_chunk_prompt(chunk) for chunk in file_chunks if chunk.strip()]
+            chunk_analyses = self.analyze_chunks_sequentially(prompts, usage)
+            all_analyses = [analysis for analysis in chunk_analyses if analysis]
 
-                if chunk_tokens > 3000:
-                    sub_analyses = self.analyze_large_chunk(chunk)
-                    all_analyses.extend(sub_analyses)
-                else:
-                    analysis = self.analyze_single_chunk(chunk)
-                    if analysis:
-                        all_analyses.append(analysis)
-
-            final_analysis = self.combine_analyses(all_analyses)
+            final_analysis, combined_ok = self.combine_analyses(all_analyses, usage)
 
             processing_time = time.time() - start_time
             self.metrics.record_llm_metrics(
-                pr_number=self.current_pr_number,
-                input_tokens=sum(len(a.split()) for a in all_analyses),
-                output_tokens=len(final_analysis.split()),
+                pr_number=pr_number,
+                input_tokens=usage['prompt_tokens'],
+                output_tokens=usage['completion_tokens'],
                 processing_time=processing_time
             )
-        
+            # A review built around failed model calls must not be reused for this diff
+            if combined_ok and None not in chunk_analyses:
+                self.db.cache_review(diff_hash, final_analysis)
+
             return final_analysis
 
         except Exception as e:
             self.metrics.record_llm_metrics(
-                    pr_number=self.current_pr_number,
-                    input_tokens=input_tokens,
-                    output_tokens=0,
+                    pr_number=pr_number,
+                    input_tokens=usage['prompt_tokens'],
+                    output_tokens=usage['completion_tokens'],
                     processing_time=time.time() - start_time,
                     error_message=str(e)
             )
             raise
 
-    def analyze_single_chunk(self, chunk: str) -> Optional[str]:
-        """Analyze a single chunk of diff that fits in context window."""
-        logger.info("Analyzing Chunk")
-        prompt = f"""As a senior developer specializing in database performance, review this section of a pull request:
-
-        {chunk}
-
-        Focus your analysis specifically on the changed lines and their immediate impact on:
-        1. Query efficiency and N+1 problems
-        2. Index usage
-        3. Transaction boundaries
-        4. Race conditions
-        5. Cache invalidation
-        6. Query plan impacts
-
-        Format your response in a concise bullet-point format focusing only on issues found, if any."""
+    def _count_tokens(self, text: str) -> int:
+        """Count model tokens in text."""
+        return len(self.llm.tokenize(text.encode('utf-8'), add_bos=False))
+
+    def _clip_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut text down to about ``max_tokens`` model tokens, keeping its head and tail."""
+        tokens = self.llm.tokenize(text.encode('utf-8'), add_bos=False)
+        if len(tokens) <= max_tokens:
+            return text
+        logger.warning(f"Clipping text from {len(tokens)} to {max_tokens} tokens")
+        half = max_tokens // 2
+        head = self.llm.detokenize(tokens[:half]).decode('utf-8', errors='ignore')
+        tail = self.llm.detokenize(tokens[-half:]).decode('utf-8', errors='ignore')
+        return f"{head}\n[... {len(tokens) - 2 * half} tokens truncated ...]\n{tail}"
+
+    def build_chunk_prompt(self, chunk: str) -> str:
+        """Build the review prompt for a single chunk of diff."""
+        return ANALYZE_PREFIX + chunk + ANALYZE_SUFFIX
+
+    def _add_usage(self, usage: Optional[Dict[str, int]], response: dict):
+        """Add a completion's token counts to a running total."""
+        if usage is not None:
+            usage['prompt_tokens'] += response['usage']['prompt_tokens']
+            usage['completion_tokens'] += response['usage']['completion_tokens']
+
+    def analyze_chunks_sequentially(self, prompts: List[str],
+                                    usage: Optional[Dict[str, int]] = None) -> List[Optional[str]]:
+        """Run chunk prompts one completion at a time, returning None for any that fail."""
+        logger.info(f"Analyzing {len(prompts)} chunks")
+        analyses = []
 
-        try:
-            response = self.llm(
-                prompt,
-                max_tokens=1024,  # Smaller response for each chunk
-                temperature=0.7,
-                stop=["Human:", "Assistant:"]
-            )
-            return response['choices'][0]['text'].strip()
-        except Exception as e:
-            logger.warning(f"Failed to analyze chunk: {e}")
-            return None
+        for prompt in prompts:
+            try:
+                # Take the model per call so other workers' chunks can interleave
+                with self._llm_lock:
+                    response = self.llm(
+                        prompt,
+                        max_tokens=CHUNK_MAX_TOKENS,  # Smaller response for each chunk
+                        echo=False,
+                        **SAMPLING_PARAMS
+                    )
+                self._add_usage(usage, response)
+                analyses.append(response['choices'][0]['text'].strip())
+            except Exception as e:
+                logger.warning(f"Failed to analyze chunk: {e}")
+                analyses.append(None)
 
-    def analyze_large_chunk(self, chunk: str) -> List[str]:
-        """Break down large chunks into smaller pieces."""
-        logger.info("Analyzing Large Chunk")
-        analyses = []
-    
-        # Split by change blocks (@@@ Changes @@@)
-        change_blocks = chunk.split('@@@ Changes @@@')
-    
-        current_block = []
-        current_tokens = 0
-    
-        for block in change_blocks:
-            block_tokens = len(block.split())
-        
-            if current_tokens + block_tokens > 3000:
-                # Analyze current accumulated blocks
-                if current_block:
-                    combined = '@@@ Changes @@@'.join(current_block)
-                    analysis = self.analyze_single_chunk(combined)
-                    if analysis:
-                        analyses.append(analysis)
-                current_block = [block]
-                current_tokens = block_tokens
-            else:
-                current_block.append(block)
-                current_tokens += block_tokens
-    
-        # Analyze any remaining blocks
-        if current_block:
-            combined = '@@@ Changes @@@'.join(current_block)
-            analysis = self.analyze_single_chunk(combined)
-            if analysis:
-                analyses.append(analysis)
-    
         return analyses
 
-    def combine_analyses(self, analyses: List[str]) -> str:
-        """Combine individual analyses into a coherent review."""
+    def combine_analyses(self, analyses: List[str], usage: Optional[Dict[str, int]] = None) -> Tuple[str, bool]:
+        """Combine individual analyses into a coherent review.
+
+        Returns the review and whether it was produced without falling back after a
+        failed summary call.
+        """
         logger.info("Combine Analyses")
 
         if not analyses:
-            return "No significant database-related issues found in the changes."
-    
-        combined_analyses = {'\n\n'.join(analyses)}
+            return "No significant database-related issues found in the changes.", True
+
+        analysis_tokens = [self._count_tokens(analysis) + 2 for analysis in analyses]  # '\n\n' separator
+
+        # A small review reads fine unsummarized, and skipping the summary saves a decode
+        if len(analyses) < SUMMARY_MIN_ANALYSES or sum(analysis_tokens) < SUMMARY_MIN_TOKENS:
+            return "Review findings:\n\n" + '\n\n'.join(analyses), True
+
+        # Slide the window forward: drop the oldest analyses until the rest fit
+        kept = []
+        used_tokens = 0
+        for analysis, tokens in zip(reversed(analyses), reversed(analysis_tokens)):
+            if used_tokens + tokens > SUMMARY_TOKEN_BUDGET:
+                break
+            kept.append(analysis)
+            used_tokens += tokens
+
+        if len(kept) < len(analyses):
+            logger.warning(f"Summarizing the last {len(kept)} of {len(analyses)} analyses to fit the context")
+        if kept:
+            combined_analyses = '\n\n'.join(reversed(kept))
+        else:
+            combined_analyses = self._clip_to_tokens(analyses[-1], SUMMARY_TOKEN_BUDGET)
 
         # Create summary prompt with all individual analyses
-        summary_prompt = f"""Synthesize these code review findings into a cohesive summary:
-            {combined_analyses}
-            Focus on:
-            1. Common themes across files
-            2. Most critical issues
-            3. Overall recommendations
-            Format with sections:
-            - Summary
-            - Critical Issues
-            - Recommendations"""
+        summary_prompt = SUMMARY_PREFIX + combined_analyses + SUMMARY_SUFFIX
 
         try:
-            response = self.llm(
-                summary_prompt,
-                max_tokens=2048,
-                temperature=0.7,
-                stop=["Human:", "Assistant:"]
-            )
-            return response['choices'][0]['text'].strip()
+            with self._llm_lock:
+                response = self.llm(
+                    summary_prompt,
+                    max_tokens=SUMMARY_MAX_TOKENS,
+                    echo=False,
+                    **SAMPLING_PARAMS
+                )
+            self._add_usage(usage, response)
+            return response['choices'][0]['text'].strip(), True
         except Exception as e:
             logger.error(f"Failed to combine analyses: {e}")
             # Fall back to simple concatenation
-            return "\n\n=====\n\n".join(analyses)
+            return "\n\n=====\n\n".join(analyses), False
 
     def process_pull_request(self, pr: dict):
         """Process a single pull request."""
@@ -299,7 +425,6 @@ class PRReviewer:
 
         try:
             pr_number = pr['number']
-            self.current_pr_number = pr_number
 
             metric_id = self.metrics.start_pr_processing(pr_number)
             
@@ -308,21 +433,38 @@ class PRReviewer:
                 self.metrics.end_pr_processing(metric_id, 'skipped')
                 return
 
+            # Skip without downloading the diff if only excluded files changed
+            changed_files = pr.get('changed_files')
+            reviewable_files = None
+            if changed_files is not None:
+                reviewable_files = {f for f in changed_files if is_reviewable_path(f)}
+                if not reviewable_files:
+                    self.db.mark_pr_processed(pr_number, status='skipped')
+                    self.metrics.end_pr_processing(metric_id, 'skipped')
+                    logger.info(f"No reviewable files in PR #{pr_number}, skipping")
+                    return
+
             # Get and analyze diff
-            diff = self.get_pr_diff(pr_number)
-            if not diff:
+            diff = self.get_pr_diff(pr_number, reviewable_files)
+            if diff is None:
                 self.metrics.end_pr_processing(metric_id, 'failed', error_message='Failed to get diff')
                 logger.error(f"Failed to get diff for PR #{pr_number}")
                 return
+            if not diff:
+                self.db.mark_pr_processed(pr_number, status='skipped')
+                self.metrics.end_pr_processing(metric_id, 'skipped')
+                logger.info(f"No reviewable changes in PR #{pr_number}, skipping")
+                return
 
             diff_size = len(diff)
 
-            review = self.analyze_diff(diff)
+            review = self.analyze_diff(diff, pr_number)
             
             # Submit review
             if self.github.submit_review_comment(pr_number, review):
-                self.db.mark_pr_processed(pr_number)
-                self.db.add_review_history(pr_number, review)
+                with self.db.transaction() as conn:
+                    self.db.mark_pr_processed(pr_number, conn=conn)
+                    self.db.add_review_history(pr_number, review, conn=conn)
                 self.metrics.end_pr_processing(metric_id, 'completed', diff_size=diff_size)
                 logger.info(f"Successfully processed PR #{pr_number}")
             else:
@@ -334,50 +476,94 @@ class PRReviewer:
             logger.error(f"Error processing PR #{pr.get('number', 'unknown')}: {e}")
 
     def check_new_prs(self):
-        """Check for new PRs and add them to the queue."""
+        """Check for new PRs and submit them to the worker pool."""
         logger.info("Check for new PRs")
-        prs = self.github.get_pull_requests()
+        self.queue_prs(self.github.get_pull_requests())
+
+    def queue_prs(self, prs: List[dict]):
+        """Submit PRs that are neither processed nor in flight to the worker pool."""
+        new_prs = []
         for pr in prs:
-            if not self.db.is_pr_processed(pr['number']):
-                self.pr_queue.put(pr)
-                logger.info(f"Queued PR #{pr['number']} for processing")
+            pr_number = pr['number']
+            if self.db.is_pr_processed(pr_number):
+                continue
+            with self._in_flight_lock:
+                # Don't resubmit PRs still being reviewed from an earlier poll
+                if pr_number in self._in_flight:
+                    continue
+                self._in_flight.add(pr_number)
+            new_prs.append(pr)
 
-    def process_queue(self):
-        """Process PRs from the queue."""
-        logger.info("Process PRs from queue")
+        # One GraphQL round trip covers the file lists of every new PR. It is only a
+        # prefilter, so a failed lookup must not strand the in-flight markers
+        try:
+            changed_files = self.github.get_pr_changed_files([pr['number'] for pr in new_prs])
+        except Exception as e:
+            logger.error(f"Failed to look up changed files: {e}")
+            changed_files = {}
+        for pr in new_prs:
+            pr = {**pr, 'changed_files': changed_files.get(pr['number'])}
+            self.executor.submit(self._process_and_release, pr)
+            logger.info(f"Queued PR #{pr['number']} for processing")
+
+    def _queue_webhook_pr(self, pr: dict):
+        """Queue a PR delivered by webhook, logging failures that would otherwise be lost."""
+        try:
+            self.queue_prs([pr])
+        except Exception as e:
+            logger.error(f"Error queueing PR #{pr['number']} from webhook: {e}")
 
-        while True:
-            try:
-                pr = self.pr_queue.get(timeout=1)
-                self.process_pull_request(pr)
-                self.pr_queue.task_done()
-            except Empty:
-                continue
-            except Exception as e:
-                logger.error(f"Error in queue processing: {e}")
-                time.sleep(1)
+    def _process_and_release(self, pr: dict):
+        """Process a PR on a worker thread and clear its in-flight marker."""
+        try:
+            self.process_pull_request(pr)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard(pr['number'])
 
     def run(self):
         """Run the PR reviewer service."""
         logger.info("Starting PR Reviewer service")
-        
-        # Start PR processing thread
-        processor_thread = Thread(target=self.process_queue, daemon=True)
-        processor_thread.start()
-        
-        # Main loop for checking new PRs
-        while True:
+
+        # With webhooks delivering PRs as they change, polling only catches
+        # anything missed while the service was down or a delivery failed
+        check_interval = Config.CHECK_INTERVAL
+        webhook = None
+        if Config.WEBHOOK_SECRET:
+            # Queue off the request thread; GitHub abandons deliveries after 10 seconds
+            webhook = WebhookServer(Config.WEBHOOK_PORT, Config.WEBHOOK_SECRET,
+                                    lambda pr: self.executor.submit(self._queue_webhook_pr, pr))
+            webhook.start()
+            check_interval = Config.RECONCILE_INTERVAL
+
+        # Main loop for checking new PRs, paced by a monotonic deadline so the
+        # time spent polling doesn't stretch the interval
+        next_check = time.monotonic()
+        while not self._stop_event.is_set():
             try:
                 self.check_new_prs()
-                if datetime.now().minute == 0:
-                    self.metrics.update_daily_metrics()
-                time.sleep(Config.CHECK_INTERVAL)
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
-                time.sleep(Config.CHECK_INTERVAL)
+            next_check = max(next_check + check_interval, time.monotonic())
+            # Wait on the stop event rather than sleeping so shutdown is immediate
+            self._stop_event.wait(max(0.0, next_check - time.monotonic()))
+
+        logger.info("Stopping PR Reviewer service")
+        if webhook is not None:
+            webhook.stop()
+        # Let reviews in progress finish; queued PRs are picked up again on the next start
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.db.close()
+        self.metrics.close()
+
+    def stop(self):
+        """Ask ``run()`` to finish its current step and shut down."""
+        self._stop_event.set()
 
 def main():
     reviewer = PRReviewer()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: reviewer.stop())
     reviewer.run()
 
 if __name__ == "__main__":
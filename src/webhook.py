@@ -0,0 +1,100 @@
+import hashlib
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# pull_request actions that can leave a PR waiting for its first review. Pushes
+# to a PR ('synchronize') are not listed: each PR is only reviewed once
+REVIEW_ACTIONS = ('opened', 'reopened', 'ready_for_review')
+# GitHub caps webhook payloads at 25 MB
+MAX_PAYLOAD_BYTES = 25 * 1024 * 1024
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """Check a payload against its X-Hub-Signature-256 header."""
+    if not signature:
+        return False
+    expected = 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    server: 'WebhookServer'
+
+    def do_POST(self):
+        if self.path != '/webhook':
+            self.send_error(404)
+            return
+
+        # The length is read before the signature can be checked, so don't trust it
+        if self.headers.get('Content-Length') is None:
+            self.send_error(411)
+            return
+        try:
+            length = int(self.headers['Content-Length'])
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_error(400)
+            return
+        if length > MAX_PAYLOAD_BYTES:
+            self.send_error(413)
+            return
+        body = self.rfile.read(length)
+
+        if not verify_signature(self.server.secret, body, self.headers.get('X-Hub-Signature-256')):
+            logger.warning("Rejected webhook with a bad signature")
+            self.send_error(401)
+            return
+
+        if self.headers.get('X-GitHub-Event') == 'pull_request':
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self.send_error(400)
+                return
+
+            pr = payload.get('pull_request') if isinstance(payload, dict) else None
+            if not isinstance(pr, dict) or 'number' not in pr:
+                self.send_error(400)
+                return
+
+            if payload.get('action') in REVIEW_ACTIONS:
+                logger.info(f"Webhook: PR #{pr['number']} {payload['action']}")
+                try:
+                    self.server.on_pull_request(pr)
+                except Exception as e:
+                    logger.error(f"Error queueing PR #{pr['number']} from webhook: {e}")
+                    self.send_error(500)
+                    return
+
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+class WebhookServer(ThreadingHTTPServer):
+    """HTTP server receiving GitHub pull_request webhooks on POST /webhook."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int, secret: str, on_pull_request: Callable[[dict], None]):
+        super().__init__(('', port), WebhookHandler)
+        self.secret = secret
+        self.on_pull_request = on_pull_request
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Serve requests on a background thread."""
+        logger.info(f"Listening for GitHub webhooks on port {self.server_address[1]}")
+        self._thread = threading.Thread(target=self.serve_forever, name='webhook', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        self.shutdown()
+        self.server_close()